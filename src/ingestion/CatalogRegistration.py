@@ -0,0 +1,269 @@
+# -------------------------------------------------------------------
+# PROJECT     : YouTube Trending Analytics Platform
+# MODULE      : Lambda - Category Metadata Catalog Registration
+# PURPOSE     : Register the cleansed category Parquet data in the AWS
+#               Glue Data Catalog for downstream Athena consumption.
+#               Runs on a schedule so the per-event ingestion Lambda
+#               never calls the Glue API.
+# RUNTIME     : AWS Lambda (EventBridge schedule, e.g. rate(1 hour))
+# AUTHOR      : Vishwanath Gogi
+#
+# MIGRATION   : One-time cut-over from the unpartitioned layout written
+#               by the old awswrangler ingestion (Parquet files directly
+#               under the cleansed root, unpartitioned Glue table).
+#               Until it is done, this Lambda fails with a RuntimeError
+#               about the table's partition keys and logs any Parquet
+#               files still outside region=<code>/ prefixes.
+#               1. Disable the ingestion trigger (SQS event source
+#                  mapping) so no new files land during the move.
+#               2. Move each root-level Parquet file under
+#                  region=<code>/ for the region it holds, or delete
+#                  them and re-copy the raw category JSON files once
+#                  ingestion is re-enabled.
+#               3. Delete the old unpartitioned Glue table
+#                  (aws glue delete-table --database-name <db> --name <table>).
+#               4. Re-enable the ingestion trigger. The next scheduled
+#                  run creates the region-partitioned table and
+#                  registers its partitions.
+# -------------------------------------------------------------------
+
+import pyarrow.fs
+import pyarrow.parquet as pq
+import boto3
+import os
+
+# -------------------------------------------------------------------
+# Environment variables passed from Lambda configuration.
+# Same values as the ingestion Lambda for the target environment.
+# -------------------------------------------------------------------
+S3_CLEANSED_PATH = os.environ['s3_cleansed_layer']
+GLUE_DB_NAME     = os.environ['glue_catalog_db_name']
+GLUE_TABLE_NAME  = os.environ['glue_catalog_table_name']
+
+# Cleansed zone location split into bucket / prefix for direct S3 access.
+CLEANSED_BUCKET, _, CLEANSED_PREFIX = S3_CLEANSED_PATH.replace('s3://', '', 1).partition('/')
+CLEANSED_PREFIX = CLEANSED_PREFIX.rstrip('/')
+
+# Listing prefix for the cleansed root. Empty when the cleansed zone is
+# a bucket root (e.g. s3://bucket/), so listings cover the whole bucket.
+CLEANSED_LIST_PREFIX = CLEANSED_PREFIX + '/' if CLEANSED_PREFIX else ''
+
+# Partition column written by the ingestion Lambda as region=<code>/.
+PARTITION_KEY = 'region'
+
+# Parquet storage settings shared by the table and its partitions.
+INPUT_FORMAT  = 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat'
+OUTPUT_FORMAT = 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat'
+SERDE_INFO    = {'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe'}
+
+# Glue accepts at most 100 partitions per BatchCreatePartition call.
+PARTITION_BATCH_SIZE = 100
+
+# Arrow type name → Glue/Athena column type.
+GLUE_TYPES = {
+    'string': 'string',
+    'bool':   'boolean',
+    'int64':  'bigint',
+    'double': 'double',
+}
+
+s3    = boto3.client('s3')
+glue  = boto3.client('glue')
+s3_fs = pyarrow.fs.S3FileSystem(region=os.environ.get('AWS_REGION', 'us-east-1'))
+
+
+def _join_key(*parts):
+    """
+    Join S3 key parts with '/', skipping empty ones (e.g. an empty
+    prefix when the cleansed zone is a bucket root).
+    """
+    return '/'.join(part for part in parts if part)
+
+
+def _table_columns():
+    """
+    Return the Glue column list of the registered table, or None if the
+    cleansed category table does not exist yet.
+
+    Raises if the table exists but is not partitioned by region (e.g. the
+    unpartitioned table previously created by awswrangler); it must be
+    migrated once before partitions can be registered.
+    """
+    try:
+        table = glue.get_table(DatabaseName=GLUE_DB_NAME, Name=GLUE_TABLE_NAME)['Table']
+    except glue.exceptions.EntityNotFoundException:
+        return None
+
+    partition_keys = [key['Name'] for key in table.get('PartitionKeys', [])]
+    if partition_keys != [PARTITION_KEY]:
+        raise RuntimeError(
+            f"Glue table {GLUE_DB_NAME}.{GLUE_TABLE_NAME} is partitioned by {partition_keys}, "
+            f"expected ['{PARTITION_KEY}']. Follow the MIGRATION steps in the header of "
+            f"CatalogRegistration.py to move existing data under {PARTITION_KEY}=<code>/ "
+            f"prefixes and recreate the table."
+        )
+    return table['StorageDescriptor']['Columns']
+
+
+def _unpartitioned_keys():
+    """
+    Return Parquet keys stored directly under the cleansed root, outside
+    any region=<code>/ prefix. These are not visible to the partitioned table.
+    """
+    keys = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=CLEANSED_BUCKET, Prefix=CLEANSED_LIST_PREFIX, Delimiter='/'):
+        keys.extend(obj['Key'] for obj in page.get('Contents', []) if obj['Key'].endswith('.parquet'))
+    return keys
+
+
+def _partition_values():
+    """
+    Return the set of region codes that have a partition prefix in S3.
+    """
+    values = set()
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=CLEANSED_BUCKET, Prefix=CLEANSED_LIST_PREFIX, Delimiter='/'):
+        for common in page.get('CommonPrefixes', []):
+            segment = common['Prefix'].rstrip('/').rsplit('/', 1)[-1]
+            if segment.startswith(PARTITION_KEY + '='):
+                values.add(segment[len(PARTITION_KEY) + 1:])
+    return values
+
+
+def _registered_partition_values():
+    """
+    Return the set of region codes already registered in the Glue table.
+    """
+    values = set()
+    paginator = glue.get_paginator('get_partitions')
+    for page in paginator.paginate(DatabaseName=GLUE_DB_NAME, TableName=GLUE_TABLE_NAME):
+        for partition in page['Partitions']:
+            values.add(partition['Values'][0])
+    return values
+
+
+def _register_partitions(values, columns):
+    """
+    Add Glue partitions for the given region codes, in batches.
+
+    BatchCreatePartition reports per-partition failures in 'Errors'
+    instead of raising. Partitions that already exist are fine; any other
+    failure is raised.
+    """
+    values = sorted(values)
+    for start in range(0, len(values), PARTITION_BATCH_SIZE):
+        response = glue.batch_create_partition(
+            DatabaseName=GLUE_DB_NAME,
+            TableName=GLUE_TABLE_NAME,
+            PartitionInputList=[
+                {
+                    'Values': [value],
+                    'StorageDescriptor': {
+                        'Columns': columns,
+                        'Location': f"s3://{_join_key(CLEANSED_BUCKET, CLEANSED_PREFIX, f'{PARTITION_KEY}={value}')}/",
+                        'InputFormat': INPUT_FORMAT,
+                        'OutputFormat': OUTPUT_FORMAT,
+                        'SerdeInfo': SERDE_INFO,
+                    },
+                }
+                for value in values[start:start + PARTITION_BATCH_SIZE]
+            ],
+        )
+        errors = [
+            error for error in response.get('Errors', [])
+            if error['ErrorDetail']['ErrorCode'] != 'AlreadyExistsException'
+        ]
+        if errors:
+            raise RuntimeError(
+                f"Failed to register {len(errors)} partition(s) in {GLUE_DB_NAME}.{GLUE_TABLE_NAME}, "
+                f"first: {errors[0]['PartitionValues']} "
+                f"({errors[0]['ErrorDetail']['ErrorCode']}: {errors[0]['ErrorDetail'].get('ErrorMessage')})"
+            )
+
+
+def _first_parquet_key():
+    """
+    Return the key of any Parquet file under a region=<code>/ prefix of
+    the cleansed zone, or None.
+    """
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=CLEANSED_BUCKET, Prefix=f"{CLEANSED_LIST_PREFIX}{PARTITION_KEY}="):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith('.parquet'):
+                return obj['Key']
+    return None
+
+
+def _create_table(schema):
+    """
+    Create the Glue Catalog table from a Parquet schema, partitioned by
+    region. Returns the table's column list.
+    """
+    columns = [
+        {'Name': field.name, 'Type': GLUE_TYPES.get(str(field.type), 'string')}
+        for field in schema
+    ]
+    glue.create_table(
+        DatabaseName=GLUE_DB_NAME,
+        TableInput={
+            'Name': GLUE_TABLE_NAME,
+            'TableType': 'EXTERNAL_TABLE',
+            'Parameters': {'classification': 'parquet'},
+            'PartitionKeys': [{'Name': PARTITION_KEY, 'Type': 'string'}],
+            'StorageDescriptor': {
+                'Columns': columns,
+                'Location': S3_CLEANSED_PATH,
+                'InputFormat': INPUT_FORMAT,
+                'OutputFormat': OUTPUT_FORMAT,
+                'SerdeInfo': SERDE_INFO,
+            },
+        },
+    )
+    return columns
+
+
+def lambda_handler(event, context):
+    """
+    Lambda entry point.
+
+    Trigger:
+        • EventBridge schedule. The schedule bounds registration to at
+          most one attempt per interval, independent of ingest volume.
+
+    Responsibilities:
+        1. If the Glue table is missing, create it from the schema of an
+           existing cleansed Parquet file.
+        2. Register any region partitions present in S3 but not yet in
+           the catalog (one partition per region, not per file).
+    """
+    try:
+        created = False
+        columns = _table_columns()
+        if columns is None:
+            key = _first_parquet_key()
+            if key is None:
+                # Nothing ingested yet; try again on the next schedule.
+                return {'created': False, 'partitions': []}
+
+            schema  = pq.read_schema(f"{CLEANSED_BUCKET}/{key}", filesystem=s3_fs)
+            columns = _create_table(schema)
+            created = True
+
+        legacy_keys = _unpartitioned_keys()
+        if legacy_keys:
+            # Pre-partitioning output; invisible to the table until migrated.
+            print(f"Found {len(legacy_keys)} Parquet file(s) outside {PARTITION_KEY}= prefixes, e.g. {legacy_keys[0]}; "
+                  f"see MIGRATION in the header of CatalogRegistration.py")
+
+        new_values = _partition_values() - _registered_partition_values()
+        _register_partitions(new_values, columns)
+        return {'created': created, 'partitions': sorted(new_values)}
+
+    except Exception as e:
+        # -------------------------------------------------------------------
+        # Structured error logging. Output captured by CloudWatch Logs.
+        # -------------------------------------------------------------------
+        print(f"Exception encountered while registering {GLUE_DB_NAME}.{GLUE_TABLE_NAME}")
+        print(e)
+        raise e
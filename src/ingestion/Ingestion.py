@@ -8,9 +8,19 @@
 # AUTHOR      : Vishwanath Gogi
 # -------------------------------------------------------------------
 
-import awswrangler as wr
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.fs
+import pyarrow.json as paj
+import pyarrow.parquet as pq
+import boto3
+import json
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
 import urllib.parse
+import re
+import hashlib
 import os
 
 # -------------------------------------------------------------------
@@ -19,36 +29,355 @@ import os
 # (dvt, qa, prod) without modifying the code.
 # -------------------------------------------------------------------
 S3_CLEANSED_PATH = os.environ['s3_cleansed_layer']
-GLUE_DB_NAME     = os.environ['glue_catalog_db_name']
-GLUE_TABLE_NAME  = os.environ['glue_catalog_table_name']
 WRITE_MODE       = os.environ['write_data_operation']
 
+# Cleansed zone location split into bucket / prefix for direct S3 access.
+CLEANSED_BUCKET, _, CLEANSED_PREFIX = S3_CLEANSED_PATH.replace('s3://', '', 1).partition('/')
+CLEANSED_PREFIX = CLEANSED_PREFIX.rstrip('/')
+
+# Objects larger than RANGE_THRESHOLD bytes are fetched as concurrent
+# byte-range GETs (up to MAX_RANGE_WORKERS) and reassembled in order.
+RANGE_THRESHOLD   = 1024 * 1024
+MAX_RANGE_WORKERS = 16
+
+# Parquet encoding for the cleansed zone. Category metadata is highly
+# repetitive, so dictionary encoding plus ZSTD compresses it well, and
+# column statistics let Athena skip row groups on min/max.
+PARQUET_OPTIONS = {
+    'compression':       'zstd',
+    'compression_level': 3,
+    'use_dictionary':    True,
+    'data_page_size':    1 << 20,
+    'write_statistics':  True,
+}
+ROW_GROUP_SIZE = 65536
+
+# Region code in a raw object key: an explicit 'region=xx' path segment,
+# or a two-letter file name prefix such as 'US_category_id.json'.
+REGION_SEGMENT_PATTERN = re.compile(r'^region=([A-Za-z]{2})$')
+REGION_FILE_PATTERN    = re.compile(r'^([A-Za-z]{2})_')
+
+# Raw objects delivered in one (SQS-batched) invocation are fetched
+# concurrently, up to MAX_OBJECT_WORKERS at a time.
+MAX_OBJECT_WORKERS = 8
+
+# -------------------------------------------------------------------
+# Session and S3 client created once per container. Warm invocations
+# reuse the connection pool, avoiding a fresh TLS handshake per event.
+# Adaptive retries back off client-side when S3 starts throttling.
+# -------------------------------------------------------------------
+SESSION = boto3.Session()
+s3 = SESSION.client(
+    's3',
+    config=Config(
+        max_pool_connections=max(32, MAX_RANGE_WORKERS + MAX_OBJECT_WORKERS),
+        retries={'max_attempts': 10, 'mode': 'adaptive'}
+    )
+)
+
+# pyarrow S3 filesystem reused for every Parquet write. Pinning the
+# region skips the per-instance region probe and credential resolution.
+s3_fs = pa.fs.S3FileSystem(region=os.environ.get('AWS_REGION', 'us-east-1'))
+
+# Separate pools so object-level tasks never wait on their own range GETs.
+range_pool  = ThreadPoolExecutor(max_workers=MAX_RANGE_WORKERS)
+object_pool = ThreadPoolExecutor(max_workers=MAX_OBJECT_WORKERS)
+
+
+# -------------------------------------------------------------------
+# Explicit Arrow schema of the YouTube videoCategoryListResponse payload.
+# Parsing against a fixed schema skips type inference and yields Arrow
+# columns directly. Fields not listed here are ignored.
+# -------------------------------------------------------------------
+CATEGORY_SNIPPET = pa.struct([
+    ('channelId',  pa.string()),
+    ('title',      pa.string()),
+    ('assignable', pa.bool_()),
+])
+
+CATEGORY_ITEM = pa.struct([
+    ('kind',    pa.string()),
+    ('etag',    pa.string()),
+    ('id',      pa.string()),
+    ('snippet', CATEGORY_SNIPPET),
+])
+
+PAYLOAD_PARSE_OPTIONS = paj.ParseOptions(
+    explicit_schema=pa.schema([('items', pa.list_(CATEGORY_ITEM))]),
+    newlines_in_values=True,
+    unexpected_field_behavior='ignore'
+)
+
+
+def _s3_objects(record):
+    """
+    Return (bucket, key, size, pin) for every raw object referenced by one
+    event record. pin holds the get_object arguments that fix the exact object
+    version announced by the event: VersionId on versioned buckets,
+    otherwise IfMatch on the ETag.
+
+    Supports both a direct S3 notification record and an SQS message whose
+    body is an S3 notification. S3 test events carry no records and yield
+    no objects.
+    """
+    if 'body' in record:
+        s3_records = json.loads(record['body']).get('Records', [])
+    else:
+        s3_records = [record]
+
+    objects = []
+    for s3_record in s3_records:
+        s3_object = s3_record['s3']['object']
+        if s3_object.get('versionId'):
+            pin = {'VersionId': s3_object['versionId']}
+        elif s3_object.get('eTag'):
+            pin = {'IfMatch': s3_object['eTag']}
+        else:
+            pin = {}
+
+        objects.append((
+            s3_record['s3']['bucket']['name'],
+            urllib.parse.unquote_plus(s3_object['key'], encoding='utf-8'),
+            s3_object['size'],
+            pin,
+        ))
+    return objects
+
+
+def _record_id(record):
+    """
+    Stable identifier of one event record: the SQS messageId, or the
+    object key and version/ETag for a direct S3 notification.
+    """
+    if 'messageId' in record:
+        return record['messageId']
+    s3_object = record['s3']['object']
+    version   = s3_object.get('versionId') or s3_object.get('eTag', '')
+    return f"{record['s3']['bucket']['name']}/{s3_object['key']}@{version}"
+
+
+def _file_name(record_ids):
+    """
+    Deterministic Parquet file name for the records combined into one
+    partition file. A redelivered batch overwrites the same key instead
+    of appending a duplicate file.
+    """
+    digest = hashlib.sha256('\n'.join(sorted(record_ids)).encode('utf-8')).hexdigest()[:32]
+    return f"{digest}.zstd.parquet"
+
+
+def _join_key(*parts):
+    """
+    Join S3 key parts with '/', skipping empty ones (e.g. an empty
+    prefix when the cleansed zone is a bucket root).
+    """
+    return '/'.join(part for part in parts if part)
+
+
+def _region(key):
+    """
+    Derive the lower-case region code for a raw object key.
+
+    Uses an explicit 'region=xx' path segment when present, otherwise the
+    two-letter file name prefix (e.g. 'US_category_id.json' → 'us').
+    Raises ValueError for keys matching neither, rather than creating a
+    bogus partition.
+    """
+    segments = key.split('/')
+    region_segments = [segment for segment in segments[:-1] if segment.startswith('region=')]
+    match = (
+        REGION_SEGMENT_PATTERN.match(region_segments[-1]) if region_segments
+        else REGION_FILE_PATTERN.match(segments[-1])
+    )
+    if match:
+        return match.group(1).lower()
+
+    raise ValueError(f"Cannot derive region from key '{key}'; expected 'region=xx/' or an 'XX_' file name prefix")
+
+
+def _sanitize_column(name):
+    """
+    Sanitize a column name the way awswrangler did for catalog tables
+    (e.g. 'snippet.channelId' → 'snippet_channelid'). Athena does not
+    allow '.' in column names.
+    """
+    return re.sub(r'[^A-Za-z0-9_]+', '_', name).lower()
+
+
+def _get_range(bucket, key, pin, start, end):
+    """
+    Fetch bytes [start, end] (inclusive) of a pinned S3 object version.
+    """
+    return s3.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{end}', **pin)['Body'].read()
+
+
+def _get_object_bytes(bucket, key, size, pin):
+    """
+    Fetch a whole S3 object.
+
+    Small objects use a single GET. Larger ones are split into up to
+    MAX_RANGE_WORKERS byte ranges fetched in parallel, overlapping the
+    per-request round-trip latency. Every GET carries the same version
+    pin, so an overwrite mid-read fails instead of mixing two versions.
+    """
+    if size <= RANGE_THRESHOLD:
+        return s3.get_object(Bucket=bucket, Key=key, **pin)['Body'].read()
+
+    part_size = -(-size // MAX_RANGE_WORKERS)
+    futures = [
+        range_pool.submit(_get_range, bucket, key, pin, start, min(start + part_size, size) - 1)
+        for start in range(0, size, part_size)
+    ]
+    return b''.join(f.result() for f in futures)
+
+
+def _read_items(bucket, key, size, pin):
+    """
+    Fetch a raw category JSON object from S3 and return its flattened
+    'items' array as an Arrow table.
+
+    The body is parsed by pyarrow's JSON reader against the explicit
+    schema, then the nested item structs are unnested in C++. Columns
+    are renamed to the sanitized form (e.g. snippet_title) used by the
+    existing Glue table.
+
+    A raw file is a single JSON object, so the read block must cover the
+    whole body; the default 1 MiB block fails on larger objects.
+
+    Raises ValueError if the payload has no 'items' array (e.g. an API
+    error response), rather than producing an empty table.
+    """
+    body    = _get_object_bytes(bucket, key, size, pin)
+    payload = paj.read_json(
+        pa.BufferReader(body),
+        read_options=paj.ReadOptions(block_size=max(len(body), 1 << 20)),
+        parse_options=PAYLOAD_PARSE_OPTIONS
+    )
+    if payload.column('items').null_count:
+        raise ValueError(f"Payload s3://{bucket}/{key} has no 'items' array")
+
+    items   = pc.list_flatten(payload.column('items'))
+    table   = pa.Table.from_struct_array(items).flatten()
+    return table.rename_columns([_sanitize_column(name) for name in table.column_names])
+
+
+def _write_parquet(table, path):
+    """
+    Stream an Arrow table to S3 as a Parquet file.
+
+    The S3 output stream uploads parts via multipart upload as they fill,
+    and the writer encodes one row group at a time, so the encoded file
+    is never buffered whole in memory.
+    """
+    with s3_fs.open_output_stream(path) as stream:
+        with pq.ParquetWriter(stream, table.schema, **PARQUET_OPTIONS) as writer:
+            for offset in range(0, table.num_rows, ROW_GROUP_SIZE):
+                writer.write_table(table.slice(offset, ROW_GROUP_SIZE))
+
+
+def _delete_prefix(bucket, prefix):
+    """
+    Remove every object under the given prefix (overwrite semantics).
+
+    Raises if S3 reports any object it could not delete, so stale data is
+    never silently left next to the new output.
+    """
+    paginator = s3.get_paginator('list_objects_v2')
+    list_prefix = prefix + '/' if prefix else ''
+    for page in paginator.paginate(Bucket=bucket, Prefix=list_prefix):
+        objects = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+        if objects:
+            response = s3.delete_objects(Bucket=bucket, Delete={'Objects': objects, 'Quiet': True})
+            errors   = response.get('Errors', [])
+            if errors:
+                raise RuntimeError(
+                    f"Failed to delete {len(errors)} object(s) under s3://{bucket}/{list_prefix}, "
+                    f"first: {errors[0].get('Key')} ({errors[0].get('Code')}: {errors[0].get('Message')})"
+                )
+
+
+def _append_parquet(partitions):
+    """
+    Write one Parquet file per (region, table, file_name) next to existing
+    data. Empty tables are skipped. A failed region does not stop the
+    others; returns ({region: uri}, {region: exception}).
+    """
+    written, failed = {}, {}
+    for region, table, file_name in partitions:
+        if table.num_rows == 0:
+            continue
+        path = _join_key(CLEANSED_BUCKET, CLEANSED_PREFIX, f"region={region}", file_name)
+        try:
+            _write_parquet(table, path)
+        except Exception as e:
+            failed[region] = e
+            continue
+        written[region] = f"s3://{path}"
+    return written, failed
+
+
+def _overwrite_parquet(partitions):
+    """
+    Replace the whole cleansed dataset with the given partitions.
+    """
+    _delete_prefix(CLEANSED_BUCKET, CLEANSED_PREFIX)
+    return _append_parquet(partitions)
+
+
+def _overwrite_partitions_parquet(partitions):
+    """
+    Replace only the region partitions present in this batch.
+    """
+    for region, _, _ in partitions:
+        _delete_prefix(CLEANSED_BUCKET, _join_key(CLEANSED_PREFIX, f"region={region}"))
+    return _append_parquet(partitions)
+
+
+# -------------------------------------------------------------------
+# Each deployment is pinned to one write mode, so resolve the writer
+# once at import instead of branching on every invocation.
+# -------------------------------------------------------------------
+WRITE_FNS = {
+    'append':               _append_parquet,
+    'overwrite':            _overwrite_parquet,
+    'overwrite_partitions': _overwrite_partitions_parquet,
+}
+if WRITE_MODE not in WRITE_FNS:
+    raise ValueError(f"Unsupported write_data_operation '{WRITE_MODE}', expected one of {sorted(WRITE_FNS)}")
+WRITE_FN = WRITE_FNS[WRITE_MODE]
+
 
 def lambda_handler(event, context):
     """
     Lambda entry point.
 
     Trigger:
-        • S3 PUT event on the raw data bucket for category JSON files.
+        • SQS queue fed by S3 PUT events on the raw data bucket for
+          category JSON files (e.g. batchSize=100,
+          maximumBatchingWindowInSeconds=60), with ReportBatchItemFailures
+          enabled on the event source mapping. A direct S3 trigger is
+          still accepted.
 
     Responsibilities:
-        1. Read raw nested JSON from S3.
-        2. Extract and flatten the 'items' array.
-        3. Write normalized data to S3 in Parquet format.
-        4. Update AWS Glue Catalog for downstream Athena consumption.
+        1. Read every raw nested JSON in the batch from S3, concurrently.
+        2. Extract and flatten the combined 'items' arrays.
+        3. Write normalized data to S3 as one Parquet file per region,
+           under region=<code>/ partitions.
+        4. Report failed SQS messages individually (batchItemFailures), so
+           one bad object does not send the whole batch back for retry.
 
     This function acts as the cleansing layer for category metadata.
+    Glue Catalog registration is handled separately by the scheduled
+    CatalogRegistration Lambda, keeping Glue API calls off the hot path.
     """
-
-    # -------------------------------------------------------------------
-    # Extract bucket name and file key from S3 trigger event.
-    # -------------------------------------------------------------------
-    bucket = event['Records'][0]['s3']['bucket']['name']
-    key    = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'], encoding='utf-8')
+    records    = event['Records']
+    is_sqs     = any('messageId' in record for record in records)
+    failed_ids = set()
+    errors     = []
 
     try:
         # -------------------------------------------------------------------
-        # STEP 1: Read raw JSON from S3.
+        # STEP 1: Read raw JSON from S3, all objects in parallel.
         #         Example structure:
         #         {
         #             "kind": "...",
@@ -57,39 +386,85 @@ def lambda_handler(event, context):
         #                 ...
         #             ]
         #         }
+        #         A record whose key or object cannot be processed is
+        #         marked failed; the rest of the batch continues.
         # -------------------------------------------------------------------
-        df_raw = wr.s3.read_json(f's3://{bucket}/{key}')
+        reads = []
+        for record in records:
+            record_id = _record_id(record)
+            try:
+                objects = _s3_objects(record)
+                regions = [_region(key) for _, key, _, _ in objects]
+            except Exception as e:
+                print(f"Exception encountered while parsing event record {record_id}")
+                print(e)
+                failed_ids.add(record_id)
+                errors.append(e)
+                continue
+
+            for obj, region in zip(objects, regions):
+                future = object_pool.submit(_read_items, *obj)
+                reads.append((record_id, f"s3://{obj[0]}/{obj[1]}", region, future))
+
+        loaded = []
+        for record_id, uri, region, future in reads:
+            try:
+                loaded.append((record_id, region, future.result()))
+            except Exception as e:
+                print(f"Exception encountered while processing {uri}")
+                print(e)
+                failed_ids.add(record_id)
+                errors.append(e)
 
         # -------------------------------------------------------------------
         # STEP 2: Normalize nested payload.
-        #         Flatten only the 'items' array, which contains the
-        #         category-level metadata required for analytics.
+        #         Only the 'items' array is kept, flattened per object in
+        #         Arrow. Records with any failed object are left out whole
+        #         (they are retried). The rest are grouped by region and
+        #         each group is combined into one table without copying.
         # -------------------------------------------------------------------
-        df_flat = pd.json_normalize(df_raw['items'])
+        loaded       = [entry for entry in loaded if entry[0] not in failed_ids]
+        by_region    = sorted(loaded, key=lambda entry: entry[1])
+        partitions   = []
+        contributors = {}
+        for region, group in groupby(by_region, key=lambda entry: entry[1]):
+            group = list(group)
+            contributors[region] = {record_id for record_id, _, _ in group}
+            partitions.append((
+                region,
+                pa.concat_tables([table for _, _, table in group]),
+                _file_name(contributors[region]),
+            ))
 
         # -------------------------------------------------------------------
         # STEP 3: Write normalized output to S3 as Parquet.
-        #         • Partition-aware
-        #         • Glue Catalog integrated
-        #         • Supports append/overwrite based on WRITE_MODE
+        #         • One file per region partition per invocation, named
+        #           from the contributing records so retries are idempotent
+        #         • Streamed via S3 multipart upload (no dataset/partition discovery)
+        #         • Supports append/overwrite/overwrite_partitions via WRITE_FN
         # -------------------------------------------------------------------
-        write_response = wr.s3.to_parquet(
-            df=df_flat,
-            path=S3_CLEANSED_PATH,
-            dataset=True,
-            database=GLUE_DB_NAME,
-            table=GLUE_TABLE_NAME,
-            mode=WRITE_MODE
-        )
-
-        # Return metadata for observability pipelines
-        return write_response
+        written, write_failed = WRITE_FN(partitions)
+        for region, e in write_failed.items():
+            print(f"Exception encountered while writing region={region}")
+            print(e)
+            failed_ids |= contributors[region]
+            errors.append(e)
 
     except Exception as e:
         # -------------------------------------------------------------------
         # Structured error logging. Output captured by CloudWatch Logs.
-        # Helps debug file-level data issues or schema mismatches.
+        # Batch-level failures (e.g. the overwrite sweep) fail every record.
         # -------------------------------------------------------------------
-        print(f"Exception encountered while processing {key} from bucket {bucket}")
+        print(f"Exception encountered while processing batch of {len(records)} record(s)")
         print(e)
-        raise e
\ No newline at end of file
+        raise e
+
+    # A direct S3 trigger has no partial-failure protocol; fail the invocation.
+    if errors and not is_sqs:
+        raise errors[0]
+
+    # Return metadata for observability pipelines
+    response = {'paths': sorted(written.values())}
+    if is_sqs:
+        response['batchItemFailures'] = [{'itemIdentifier': record_id} for record_id in sorted(failed_ids)]
+    return response
\ No newline at end of file
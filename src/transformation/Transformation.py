@@ -10,12 +10,11 @@
 # -------------------------------------------------------------------
 
 import sys
-from awsglue.transforms import ApplyMapping, ResolveChoice, DropNullFields
 from awsglue.utils import getResolvedOptions
 from awsglue.job import Job
 from awsglue.context import GlueContext
-from awsglue.dynamicframe import DynamicFrame
 from pyspark.context import SparkContext
+from pyspark.sql.functions import col
 
 # -------------------------------------------------------------------
 # Glue Job Initialization
@@ -39,11 +38,70 @@ SOURCE_DB = "de_youtube_raw"
 SOURCE_TABLE = "raw_statistics"
 TARGET_S3_PATH = "s3://de-on-youtube-cleansed-useast1-dvt/youtube/raw_statistics/"
 PARTITION_KEYS = ["region"]
+MAX_RECORDS_PER_FILE = 1_000_000
+
+# Output schema: (column, type). Applied as a single select of casts.
+COLUMN_TYPES = [
+    ("video_id", "string"),
+    ("trending_date", "string"),
+    ("title", "string"),
+    ("channel_title", "string"),
+    ("category_id", "long"),
+    ("publish_time", "string"),
+    ("tags", "string"),
+    ("views", "long"),
+    ("likes", "long"),
+    ("dislikes", "long"),
+    ("comment_count", "long"),
+    ("thumbnail_link", "string"),
+    ("comments_disabled", "boolean"),
+    ("ratings_disabled", "boolean"),
+    ("video_error_or_removed", "boolean"),
+    ("description", "string"),
+    ("region", "string")
+]
+
+# -------------------------------------------------------------------
+# Column Projection
+# Optional job parameter --PROJECT_COLUMNS (comma-separated) limits the
+# columns carried through the job and written. Partition keys are
+# always kept. Unknown names fail the job rather than being dropped.
+# -------------------------------------------------------------------
+if "--PROJECT_COLUMNS" in sys.argv:
+    PROJECT_COLUMNS = [
+        c.strip()
+        for c in getResolvedOptions(sys.argv, ["PROJECT_COLUMNS"])["PROJECT_COLUMNS"].split(",")
+        if c.strip()
+    ]
+    unknown_columns = sorted(set(PROJECT_COLUMNS) - {name for name, _ in COLUMN_TYPES})
+    if unknown_columns:
+        raise ValueError(
+            f"Unknown column(s) in --PROJECT_COLUMNS: {unknown_columns}; "
+            f"expected names from {[name for name, _ in COLUMN_TYPES]}"
+        )
+else:
+    PROJECT_COLUMNS = [name for name, _ in COLUMN_TYPES]
+
+SELECTED_COLUMNS = [
+    (name, dtype) for name, dtype in COLUMN_TYPES
+    if name in PROJECT_COLUMNS or name in PARTITION_KEYS
+]
+if all(name in PARTITION_KEYS for name, _ in SELECTED_COLUMNS):
+    raise ValueError(
+        f"--PROJECT_COLUMNS must include at least one column besides the "
+        f"partition keys {PARTITION_KEYS}"
+    )
 
 # -------------------------------------------------------------------
 # STEP 1: Read Raw Data From Glue Catalog
 # This loads the dataset registered by Glue Crawler.
-# Predicate pushdown dramatically reduces scan size.
+# Predicate pushdown prunes region partitions before the scan, and
+# transformation_ctx keeps Glue job bookmarks tracking processed files,
+# so each run reads only new data and the append write stays incremental.
+# Everything after the read runs on the native Spark DataFrame.
+# Rows without a video_id are structurally invalid and dropped here.
+# The source is a crawled CSV table, so this is a plain row filter;
+# there are no Parquet statistics to push it down to.
 # -------------------------------------------------------------------
 raw_dyf = glue_context.create_dynamic_frame.from_catalog(
     database=SOURCE_DB,
@@ -53,73 +111,39 @@ raw_dyf = glue_context.create_dynamic_frame.from_catalog(
 )
 
 # -------------------------------------------------------------------
-# STEP 2: Apply Schema Normalization
-# Ensures consistent data types across the dataset.
-# -------------------------------------------------------------------
-mapped_dyf = ApplyMapping.apply(
-    frame=raw_dyf,
-    mappings=[
-        ("video_id", "string", "video_id", "string"),
-        ("trending_date", "string", "trending_date", "string"),
-        ("title", "string", "title", "string"),
-        ("channel_title", "string", "channel_title", "string"),
-        ("category_id", "long", "category_id", "long"),
-        ("publish_time", "string", "publish_time", "string"),
-        ("tags", "string", "tags", "string"),
-        ("views", "long", "views", "long"),
-        ("likes", "long", "likes", "long"),
-        ("dislikes", "long", "dislikes", "long"),
-        ("comment_count", "long", "comment_count", "long"),
-        ("thumbnail_link", "string", "thumbnail_link", "string"),
-        ("comments_disabled", "boolean", "comments_disabled", "boolean"),
-        ("ratings_disabled", "boolean", "ratings_disabled", "boolean"),
-        ("video_error_or_removed", "boolean", "video_error_or_removed", "boolean"),
-        ("description", "string", "description", "string"),
-        ("region", "string", "region", "string")
-    ],
-    transformation_ctx="mapped_dyf"
-)
-
+# No new input since the last bookmark: the DynamicFrame has no schema,
+# so toDF() yields a DataFrame without columns. Commit the bookmark and
+# exit cleanly instead of failing on the column references below.
 # -------------------------------------------------------------------
-# STEP 3: Resolve Ambiguous Types
-# Ensures data consistency for Athena and downstream analytics.
-# -------------------------------------------------------------------
-resolved_dyf = ResolveChoice.apply(
-    frame=mapped_dyf,
-    choice="make_struct",
-    transformation_ctx="resolved_dyf"
-)
+unfiltered_df = raw_dyf.toDF()
+if not unfiltered_df.columns:
+    job.commit()
+    sys.exit(0)
 
-# -------------------------------------------------------------------
-# STEP 4: Drop Null Fields
-# Removes structurally invalid records and cleans dataset.
-# -------------------------------------------------------------------
-clean_dyf = DropNullFields.apply(
-    frame=resolved_dyf,
-    transformation_ctx="clean_dyf"
+raw_df = (
+    unfiltered_df
+    .where(col("video_id").isNotNull())
+    .select(*[name for name, _ in SELECTED_COLUMNS])
 )
 
 # -------------------------------------------------------------------
-# STEP 5: Coalesce Output to Reduce File Count
-# Converts DynamicFrame → Spark DataFrame → back to DynamicFrame.
-# This produces cleaner S3 output, easier for Athena partitions.
+# STEP 2: Apply Schema Normalization
+# Ensures consistent data types across the dataset. Every column is
+# cast explicitly, so no ambiguous (choice) types can remain.
 # -------------------------------------------------------------------
-df = clean_dyf.toDF().coalesce(1)
-final_dyf = DynamicFrame.fromDF(df, glue_context, "final_dyf")
+df = raw_df.select(*[col(name).cast(dtype).alias(name) for name, dtype in SELECTED_COLUMNS])
 
 # -------------------------------------------------------------------
-# STEP 6: Write Transformed Data to Cleansed S3 Zone
-# Writes Parquet files partitioned by region.
-# -------------------------------------------------------------------
-glue_context.write_dynamic_frame.from_options(
-    frame=final_dyf,
-    connection_type="s3",
-    connection_options={
-        "path": TARGET_S3_PATH,
-        "partitionKeys": PARTITION_KEYS
-    },
-    format="parquet",
-    transformation_ctx="datasink"
+# STEP 3: Write Transformed Data to Cleansed S3 Zone
+# Writes Parquet files partitioned by region, in parallel across tasks.
+# maxRecordsPerFile caps file size without funnelling into one task.
+# -------------------------------------------------------------------
+(
+    df.write
+    .mode("append")
+    .partitionBy(*PARTITION_KEYS)
+    .option("maxRecordsPerFile", MAX_RECORDS_PER_FILE)
+    .parquet(TARGET_S3_PATH)
 )
 
 # -------------------------------------------------------------------